@@ -0,0 +1,104 @@
+from base64 import b64decode, b64encode
+from hashlib import sha1
+from math import ceil, log
+from typing import Iterable, List, Set
+
+from enums import (BLOOM_FILTER_TOKEN_LENGTH, CLASS_DATA_SPLITTER,
+                   DATA_LIST_SPLITTER)
+
+
+def tokenize(name: str) -> Set[str]:
+    # Search matches substrings, so names are summarized by their n-grams:
+    # every n-gram of a query must appear in a name that contains it.
+    name = name.lower()
+    return {
+        name[i:i + BLOOM_FILTER_TOKEN_LENGTH]
+        for i in range(len(name) - BLOOM_FILTER_TOKEN_LENGTH + 1)
+    }
+
+
+class BloomFilter:
+    def __init__(self, size, number_of_hashes, bits=None):
+        self.size = size
+        self.number_of_hashes = number_of_hashes
+        self.bits = bytearray(bits) if bits is not None else bytearray((size + 7) // 8)
+
+    @staticmethod
+    def size_for(expected_items, false_positive_rate):
+        # Optimal size for holding expected_items at false_positive_rate,
+        # rounded up to whole bytes.
+        size = ceil(-expected_items * log(false_positive_rate) / log(2) ** 2)
+        return max(8, (size + 7) // 8 * 8)
+
+    @staticmethod
+    def number_of_hashes_for(size, expected_items):
+        return max(1, round(size / expected_items * log(2)))
+
+    def _positions(self, item: str) -> List[int]:
+        digest = sha1(item.encode()).digest()
+        first_hash = int.from_bytes(digest[:8], 'big')
+        second_hash = int.from_bytes(digest[8:16], 'big') | 1
+        return [
+            (first_hash + i * second_hash) % self.size
+            for i in range(self.number_of_hashes)
+        ]
+
+    def add(self, item: str):
+        for position in self._positions(item):
+            self.bits[position // 8] |= 1 << (position % 8)
+
+    def __contains__(self, item: str):
+        return all(
+            self.bits[position // 8] & (1 << (position % 8))
+            for position in self._positions(item)
+        )
+
+    def contains_all(self, items: Iterable[str]):
+        return all(item in self for item in items)
+
+    def update(self, other: 'BloomFilter'):
+        bits = int.from_bytes(self.bits, 'little') | int.from_bytes(other.bits, 'little')
+        self.bits = bytearray(bits.to_bytes(len(self.bits), 'little'))
+
+    def copy(self):
+        return BloomFilter(self.size, self.number_of_hashes, self.bits)
+
+    def __str__(self):
+        return b64encode(bytes(self.bits)).decode()
+
+    @staticmethod
+    def from_str(str_data, size, number_of_hashes):
+        return BloomFilter(size, number_of_hashes, b64decode(str_data))
+
+
+class AttenuatedBloomFilter:
+    # Level i summarizes the file names reachable i hops behind the neighbor
+    # that sent the filter (level 0 being the neighbor's own files).
+    def __init__(self, depth, size, number_of_hashes, levels=None):
+        self.depth = depth
+        self.size = size
+        self.number_of_hashes = number_of_hashes
+        self.levels: List[BloomFilter] = levels or [
+            BloomFilter(size, number_of_hashes)
+            for _ in range(depth)
+        ]
+
+    def might_contain(self, tokens: Set[str]):
+        return any(level.contains_all(tokens) for level in self.levels)
+
+    def __str__(self):
+        return CLASS_DATA_SPLITTER.join([
+            str(self.size),
+            str(self.number_of_hashes),
+            DATA_LIST_SPLITTER.join([str(level) for level in self.levels]),
+        ])
+
+    @staticmethod
+    def from_str(str_data):
+        data = str_data.split(CLASS_DATA_SPLITTER)
+        size, number_of_hashes = int(data[0]), int(data[1])
+        levels = [
+            BloomFilter.from_str(level_str, size, number_of_hashes)
+            for level_str in data[2].split(DATA_LIST_SPLITTER)
+        ]
+        return AttenuatedBloomFilter(len(levels), size, number_of_hashes, levels)
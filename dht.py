@@ -0,0 +1,242 @@
+from dataclasses import dataclass, field
+from hashlib import sha1
+from threading import Event, Lock, Thread
+from time import time
+from typing import Callable, Dict, List, Optional, Tuple
+from uuid import uuid4
+
+from enums import (CLASS_DATA_SPLITTER, DHT_ALPHA, DHT_BUCKET_SIZE,
+                   DHT_ID_BITS)
+
+
+def dht_key(value: str) -> int:
+    return int.from_bytes(sha1(value.encode()).digest(), 'big')
+
+
+@dataclass
+class DhtRecord:
+    file_name: str
+    file_size: int
+    source: str
+    expires_at: float
+
+    def __str__(self):
+        # Clocks are not shared between nodes, so the remaining lifetime is
+        # sent instead of the expiration time.
+        time_to_live = max(0, int(self.expires_at - time()))
+        return CLASS_DATA_SPLITTER.join([self.file_name, str(self.file_size), self.source, str(time_to_live)])
+
+    @staticmethod
+    def from_str(str_data):
+        data = str_data.split(CLASS_DATA_SPLITTER)
+        return DhtRecord(data[0], int(data[1]), data[2], time() + int(data[3]))
+
+
+@dataclass
+class LookupResult:
+    contacts: List[str] = field(default_factory=list)
+    records: List[DhtRecord] = field(default_factory=list)
+    hops: int = 0
+    messages: int = 0
+
+
+class RoutingTable:
+    def __init__(self, node_address, bucket_size=DHT_BUCKET_SIZE):
+        self.node_address = node_address
+        self.node_id = dht_key(node_address)
+        self.bucket_size = bucket_size
+        self.buckets: List[List[str]] = [[] for _ in range(DHT_ID_BITS)]
+        self.bucket_lock = Lock()
+
+    def get_bucket(self, address) -> List[str]:
+        return self.buckets[(dht_key(address) ^ self.node_id).bit_length() - 1]
+
+    def add_contact(self, address):
+        if address == self.node_address:
+            return
+        with self.bucket_lock:
+            bucket = self.get_bucket(address)
+            if address in bucket:
+                bucket.remove(address)
+                bucket.append(address)
+            elif len(bucket) < self.bucket_size:
+                # Full buckets keep their old contacts, since long-lived
+                # nodes are the most likely to stay online.
+                bucket.append(address)
+
+    def remove_contact(self, address):
+        with self.bucket_lock:
+            bucket = self.get_bucket(address)
+            if address in bucket:
+                bucket.remove(address)
+
+    def find_closest(self, key, count=None) -> List[str]:
+        with self.bucket_lock:
+            contacts = [contact for bucket in self.buckets for contact in bucket]
+        return sorted(contacts, key=lambda contact: dht_key(contact) ^ key)[:count or self.bucket_size]
+
+
+class RecordStore:
+    def __init__(self):
+        self.records: Dict[int, Dict[str, DhtRecord]] = dict()
+        self.record_lock = Lock()
+
+    def store(self, key, record: DhtRecord):
+        with self.record_lock:
+            self.records.setdefault(key, dict())[record.source] = record
+
+    def get(self, key) -> List[DhtRecord]:
+        now = time()
+        with self.record_lock:
+            return [
+                record
+                for record in self.records.get(key, dict()).values()
+                if record.expires_at > now
+            ]
+
+    def remove_expired_records(self):
+        now = time()
+        with self.record_lock:
+            for key in list(self.records):
+                self.records[key] = {
+                    source: record
+                    for source, record in self.records[key].items()
+                    if record.expires_at > now
+                }
+                if not self.records[key]:
+                    del self.records[key]
+
+
+class RpcTracker:
+    def __init__(self):
+        self.pending_rpcs: Dict[str, Tuple[Event, list]] = dict()
+        self.rpc_lock = Lock()
+
+    def create_rpc(self):
+        rpc_id = uuid4().hex
+        with self.rpc_lock:
+            self.pending_rpcs[rpc_id] = (Event(), [])
+        return rpc_id
+
+    def resolve_rpc(self, rpc_id, response):
+        with self.rpc_lock:
+            if rpc_id not in self.pending_rpcs:
+                return
+            event, responses = self.pending_rpcs[rpc_id]
+        responses.append(response)
+        event.set()
+
+    def wait_for_rpc(self, rpc_id, timeout):
+        event, responses = self.pending_rpcs[rpc_id]
+        event.wait(timeout)
+        with self.rpc_lock:
+            del self.pending_rpcs[rpc_id]
+        return responses[0] if responses else None
+
+
+FindRpc = Callable[[str, int, bool], Optional[Tuple[List[str], List[DhtRecord]]]]
+StoreRpc = Callable[[str, int, DhtRecord], None]
+
+
+class DistributedHashTable:
+    def __init__(self, node_address, find_rpc: FindRpc, store_rpc: StoreRpc, bucket_size=DHT_BUCKET_SIZE, alpha=DHT_ALPHA):
+        self.routing_table = RoutingTable(node_address, bucket_size)
+        self.record_store = RecordStore()
+        self.find_rpc = find_rpc
+        self.store_rpc = store_rpc
+        self.alpha = alpha
+
+    def bootstrap(self, addresses) -> LookupResult:
+        for address in addresses:
+            self.routing_table.add_contact(address)
+        return self.lookup(self.routing_table.node_id)
+
+    def handle_find(self, from_address, key, find_value) -> Tuple[List[str], List[DhtRecord]]:
+        self.routing_table.add_contact(from_address)
+        records = self.record_store.get(key) if find_value else []
+        if records:
+            return [], records
+        return self.routing_table.find_closest(key), []
+
+    def handle_store(self, from_address, key, record: DhtRecord):
+        self.routing_table.add_contact(from_address)
+        self.record_store.store(key, record)
+
+    def lookup(self, key, find_value=False) -> LookupResult:
+        if find_value:
+            records = self.record_store.get(key)
+            if records:
+                return LookupResult(records=records)
+
+        result = LookupResult()
+        node_address = self.routing_table.node_address
+        bucket_size = self.routing_table.bucket_size
+        shortlist = self.routing_table.find_closest(key)
+        queried_contacts = set()
+        while True:
+            candidates = [
+                contact
+                for contact in shortlist[:bucket_size]
+                if contact not in queried_contacts
+            ][:self.alpha]
+            if not candidates:
+                break
+
+            result.hops += 1
+            queried_contacts.update(candidates)
+            records_by_source = dict()
+            for contact, response in zip(candidates, self.find_in_parallel(candidates, key, find_value)):
+                result.messages += 1
+                if response is None:
+                    self.routing_table.remove_contact(contact)
+                    shortlist.remove(contact)
+                    continue
+
+                result.messages += 1
+                self.routing_table.add_contact(contact)
+                contacts, records = response
+                for record in records:
+                    records_by_source[record.source] = record
+                for new_contact in contacts:
+                    if new_contact != node_address and new_contact not in shortlist:
+                        shortlist.append(new_contact)
+            shortlist.sort(key=lambda contact: dht_key(contact) ^ key)
+            if records_by_source:
+                result.records = list(records_by_source.values())
+                break
+
+        result.contacts = shortlist[:bucket_size]
+        return result
+
+    def find_in_parallel(self, contacts: List[str], key, find_value):
+        # A round's RPCs run concurrently, so it takes at most one
+        # DHT_RPC_TIMEOUT_IN_SECONDS however many of its contacts are dead.
+        responses = [None] * len(contacts)
+
+        def find(index, contact):
+            responses[index] = self.find_rpc(contact, key, find_value)
+
+        threads = [
+            Thread(target=find, args=(index, contact))
+            for index, contact in enumerate(contacts)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return responses
+
+    def publish(self, key, record: DhtRecord) -> LookupResult:
+        result = self.lookup(key)
+        node_address = self.routing_table.node_address
+        closest_nodes = sorted(
+            [node_address, *result.contacts],
+            key=lambda contact: dht_key(contact) ^ key,
+        )[:self.routing_table.bucket_size]
+        for contact in closest_nodes:
+            if contact == node_address:
+                self.record_store.store(key, record)
+            else:
+                self.store_rpc(contact, key, record)
+                result.messages += 1
+        return result
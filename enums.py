@@ -11,9 +11,17 @@ REQUEST_FOR_FILE = 'REQUEST_4_FILE'
 FILE_SEARCH_RESULT = 'FILE_SEARCH_RESULT'
 DOWNLOAD_FILE_REQUEST = 'DOWNLOAD_FILE_REQUEST'
 DOWNLOAD_FILE = 'DOWNLOAD_FILE'
+FILTER_UPDATE = 'FILTER_UPDATE'
+DHT_FIND_NODE = 'DHT_FIND_NODE'
+DHT_FIND_VALUE = 'DHT_FIND_VALUE'
+DHT_STORE = 'DHT_STORE'
+DHT_RESPONSE = 'DHT_RESPONSE'
 
 BROADCAST_TIME_LIMIT_IN_SECONDS = 2
 
+UDP_BUFFER_SIZE = 65535
+MAX_UDP_PAYLOAD_SIZE = 65507
+
 DATA_SPLITTER = ';'
 DATA_LIST_SPLITTER = '#'
 DATA_TUPLE_SPLITTER = '@'
@@ -24,6 +32,8 @@ STATE_SEARCH = 'SEARCH'
 STATE_WAIT = 'WAIT'
 STAET_SELECT = 'SELECT'
 
+EXACT_SEARCH_PREFIX = '='
+
 CHUNK_SIZE = 10
 
 START_CHUNK_DATA = 'START_CHUNK'
@@ -33,3 +43,18 @@ END_CHUNK_DATA = 'END_CHUNK'
 END_CHUNK_NO = -2
 
 NEXT_PACKET_SIZE_LEN = 4
+
+BLOOM_FILTER_FALSE_POSITIVE_RATE = 0.05
+BLOOM_FILTER_DEPTH = 2
+BLOOM_FILTER_EXPECTED_TOKENS_PER_NODE = 100
+BLOOM_FILTER_EXPECTED_FANOUT = 32
+BLOOM_FILTER_TOKEN_LENGTH = 3
+BLOOM_FILTER_UPDATE_INTERVAL_IN_SECONDS = 5
+
+DHT_ENABLED = False
+DHT_ID_BITS = 160
+DHT_BUCKET_SIZE = 8
+DHT_ALPHA = 3
+DHT_RPC_TIMEOUT_IN_SECONDS = 2
+DHT_RECORD_TTL_IN_SECONDS = 300
+DHT_REPUBLISH_INTERVAL_IN_SECONDS = 120
@@ -31,6 +31,9 @@ class FileSystem:
             print("ERROR: folder does not exist")
         return files
 
+    def list_files(self) -> List[FileSystemSearchResult]:
+        return self.search_for_file('')
+
     def get_file_content(self, file_name: str) -> bytes:
         file_path = os.path.join(self.folder_address, file_name)
         with open(file_path, 'rb') as f:
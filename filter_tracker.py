@@ -0,0 +1,122 @@
+from threading import Lock
+from typing import Dict, Iterable, List, Set
+
+from bloom_filter import AttenuatedBloomFilter, BloomFilter, tokenize
+from enums import (BLOOM_FILTER_DEPTH, BLOOM_FILTER_EXPECTED_FANOUT,
+                   BLOOM_FILTER_EXPECTED_TOKENS_PER_NODE,
+                   BLOOM_FILTER_FALSE_POSITIVE_RATE, DATA_SPLITTER,
+                   FILTER_UPDATE, MAX_UDP_PAYLOAD_SIZE)
+from file_system import FileSystemSearchResult
+
+
+class FilterTracker:
+    def __init__(
+        self,
+        false_positive_rate=BLOOM_FILTER_FALSE_POSITIVE_RATE,
+        depth=BLOOM_FILTER_DEPTH,
+        expected_tokens_per_node=BLOOM_FILTER_EXPECTED_TOKENS_PER_NODE,
+        expected_fanout=BLOOM_FILTER_EXPECTED_FANOUT,
+    ):
+        # All levels share one size, fitted to the deepest level's expected load.
+        if depth < 2:
+            raise ValueError('Bloom filter depth must be at least 2')
+        self.depth = depth
+        expected_items = expected_tokens_per_node * expected_fanout ** (depth - 1)
+        self.size = BloomFilter.size_for(expected_items, false_positive_rate)
+        self.number_of_hashes = BloomFilter.number_of_hashes_for(
+            self.size, expected_items)
+        packet_size = len(FILTER_UPDATE + DATA_SPLITTER + str(
+            AttenuatedBloomFilter(self.depth, self.size, self.number_of_hashes)))
+        if packet_size > MAX_UDP_PAYLOAD_SIZE:
+            raise ValueError(
+                f'Bloom filter updates would take {packet_size} bytes, more than the '
+                f'{MAX_UDP_PAYLOAD_SIZE} bytes of a UDP packet; lower the depth, fanout '
+                'or expected tokens, or raise the false-positive rate'
+            )
+        self.local_filter = BloomFilter(self.size, self.number_of_hashes)
+        self.local_file_names: Set[str] = set()
+        self.neighbor_filters: Dict[str, AttenuatedBloomFilter] = dict()
+        self.sent_filters: Dict[str, str] = dict()
+        self.filter_lock = Lock()
+
+    def rebuild_local_filter(self, files: List[FileSystemSearchResult]):
+        # Bloom filters cannot drop items, so removed files need a rebuild;
+        # an unchanged listing keeps the current filter.
+        file_names = {file.name for file in files}
+        with self.filter_lock:
+            if file_names == self.local_file_names:
+                return
+        local_filter = BloomFilter(self.size, self.number_of_hashes)
+        for file_name in file_names:
+            for token in tokenize(file_name):
+                local_filter.add(token)
+        with self.filter_lock:
+            self.local_filter = local_filter
+            self.local_file_names = file_names
+
+    def add_local_file(self, file_name):
+        with self.filter_lock:
+            self.local_file_names.add(file_name)
+            for token in tokenize(file_name):
+                self.local_filter.add(token)
+
+    def update_neighbor_filter(self, neighbor_address, bloom_filter: AttenuatedBloomFilter):
+        if (bloom_filter.size, bloom_filter.number_of_hashes) != (self.size, self.number_of_hashes):
+            print('ERROR: incompatible filter from', neighbor_address)
+            return
+        with self.filter_lock:
+            self.neighbor_filters[neighbor_address] = bloom_filter
+
+    def create_filter_for_neighbor(self, neighbor_address, neighbors: Iterable[str]) -> AttenuatedBloomFilter:
+        bloom_filter = AttenuatedBloomFilter(
+            self.depth, self.size, self.number_of_hashes)
+        with self.filter_lock:
+            bloom_filter.levels[0].update(self.local_filter)
+            for other_neighbor in neighbors:
+                if other_neighbor == neighbor_address:
+                    continue
+                other_filter = self.neighbor_filters.get(other_neighbor)
+                if other_filter is None:
+                    continue
+                for level in range(1, self.depth):
+                    if level < self.depth - 1:
+                        bloom_filter.levels[level].update(
+                            other_filter.levels[level - 1])
+                    else:
+                        # The deepest level also sums up everything beyond
+                        # it, so files past the horizon stay reachable.
+                        for other_level in other_filter.levels[level - 1:]:
+                            bloom_filter.levels[level].update(other_level)
+        return bloom_filter
+
+    def create_filter_updates(self, neighbors: Iterable[str]) -> Dict[str, AttenuatedBloomFilter]:
+        # Only filters that differ from the last one sent to a neighbor are
+        # returned, and they are remembered as sent.
+        neighbors = list(neighbors)
+        filter_updates = dict()
+        for neighbor in neighbors:
+            bloom_filter = self.create_filter_for_neighbor(neighbor, neighbors)
+            filter_str = str(bloom_filter)
+            with self.filter_lock:
+                if self.sent_filters.get(neighbor) == filter_str:
+                    continue
+                self.sent_filters[neighbor] = filter_str
+            filter_updates[neighbor] = bloom_filter
+        return filter_updates
+
+    def forget_sent_filter(self, neighbor_address):
+        with self.filter_lock:
+            self.sent_filters.pop(neighbor_address, None)
+
+    def choose_neighbors_for_search(self, neighbors: Iterable[str], file_name) -> List[str]:
+        # Search returns every match, so a query follows each neighbor that
+        # might lead to one at any level; neighbors with no known filter are
+        # always included.
+        tokens = tokenize(file_name)
+        with self.filter_lock:
+            return [
+                neighbor
+                for neighbor in neighbors
+                if neighbor not in self.neighbor_filters
+                or self.neighbor_filters[neighbor].might_contain(tokens)
+            ]
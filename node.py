@@ -3,19 +3,28 @@ from datetime import datetime, timedelta
 from socket import (AF_INET, SO_BROADCAST, SOCK_DGRAM, SOCK_STREAM, SOL_SOCKET,
                     socket)
 from threading import Thread
-from time import sleep
+from time import sleep, time
 from typing import Iterable, List, Set
 from uuid import uuid4
 
-from enums import (ACK_FOR_JOIN, BROADCAST_ADDRESS, BROADCAST_LISTEN_PORT,
+from bloom_filter import AttenuatedBloomFilter
+from dht import DhtRecord, DistributedHashTable, RpcTracker, dht_key
+from enums import (ACK_FOR_JOIN, BLOOM_FILTER_UPDATE_INTERVAL_IN_SECONDS,
+                   BROADCAST_ADDRESS, BROADCAST_LISTEN_PORT,
                    BROADCAST_TIME_LIMIT_IN_SECONDS, CHUNK_SIZE,
                    DATA_LIST_SPLITTER, DATA_SPLITTER, DEFUALT_ADDRESS,
-                   DOWNLOAD_FILE, DOWNLOAD_FILE_REQUEST, END_CHUNK_DATA,
-                   END_CHUNK_NO, FILE_SEARCH_RESULT, NEXT_PACKET_SIZE_LEN, REQUEST_FOR_FILE,
-                   REQUEST_FOR_JOIN, REQUEST_FOR_NEIGHBOR, STAET_SELECT,
-                   START_CHUNK_DATA, START_CHUNK_NO, STATE_SEARCH, STATE_WAIT,
-                   TCP_LISTEN_PORT, UDP_LISTEN_PORT)
+                   DHT_ENABLED, DHT_FIND_NODE, DHT_FIND_VALUE,
+                   DHT_RECORD_TTL_IN_SECONDS,
+                   DHT_REPUBLISH_INTERVAL_IN_SECONDS, DHT_RESPONSE,
+                   DHT_RPC_TIMEOUT_IN_SECONDS, DHT_STORE, DOWNLOAD_FILE,
+                   DOWNLOAD_FILE_REQUEST, END_CHUNK_DATA, END_CHUNK_NO,
+                   EXACT_SEARCH_PREFIX, FILE_SEARCH_RESULT, FILTER_UPDATE,
+                   NEXT_PACKET_SIZE_LEN, REQUEST_FOR_FILE, REQUEST_FOR_JOIN,
+                   REQUEST_FOR_NEIGHBOR, STAET_SELECT, START_CHUNK_DATA,
+                   START_CHUNK_NO, STATE_SEARCH, STATE_WAIT, TCP_LISTEN_PORT,
+                   UDP_BUFFER_SIZE, UDP_LISTEN_PORT)
 from file_system import FileSystem, FileSystemSearchResult
+from filter_tracker import FilterTracker
 from search_tracker import FileSearchResult, SearchTracker
 
 
@@ -64,6 +73,30 @@ class Packet:
                     data[3].split(DATA_LIST_SPLITTER) if data[3] else [],
                     int(data[4]),
                 )
+        elif command == FILTER_UPDATE:
+            return FilterUpdatePacket(
+                AttenuatedBloomFilter.from_str(data[0]),
+            )
+        elif command in (DHT_FIND_NODE, DHT_FIND_VALUE):
+            return DhtFindPacket(
+                data[0],
+                int(data[1], 16),
+                command == DHT_FIND_VALUE,
+            )
+        elif command == DHT_RESPONSE:
+            return DhtResponsePacket(
+                data[0],
+                data[1].split(DATA_LIST_SPLITTER) if data[1] else [],
+                [
+                    DhtRecord.from_str(record_str)
+                    for record_str in (data[2].split(DATA_LIST_SPLITTER) if data[2] else [])
+                ],
+            )
+        elif command == DHT_STORE:
+            return DhtStorePacket(
+                int(data[0], 16),
+                DhtRecord.from_str(data[1]),
+            )
 
         return Packet('ERRRRRRROR')
 
@@ -178,16 +211,71 @@ class DownloadFileEndPacket(DownloadFilePacket):
         super().__init__(END_CHUNK_NO, END_CHUNK_DATA, file_name, [])
 
 
+class FilterUpdatePacket(Packet):
+    def __init__(self, bloom_filter: AttenuatedBloomFilter) -> None:
+        self.bloom_filter = bloom_filter
+        return super().__init__(data=[
+            FILTER_UPDATE,
+            str(bloom_filter),
+        ])
+
+
+class DhtFindPacket(Packet):
+    def __init__(self, rpc_id, key, find_value) -> None:
+        self.rpc_id = rpc_id
+        self.key = key
+        self.find_value = find_value
+        return super().__init__(data=[
+            DHT_FIND_VALUE if find_value else DHT_FIND_NODE,
+            rpc_id,
+            format(key, 'x'),
+        ])
+
+
+class DhtResponsePacket(Packet):
+    def __init__(self, rpc_id, contacts, records) -> None:
+        self.rpc_id = rpc_id
+        self.contacts = contacts
+        self.records = records
+        return super().__init__(data=[
+            DHT_RESPONSE,
+            rpc_id,
+            DATA_LIST_SPLITTER.join(contacts),
+            DATA_LIST_SPLITTER.join([str(record) for record in records]),
+        ])
+
+
+class DhtStorePacket(Packet):
+    def __init__(self, key, record) -> None:
+        self.key = key
+        self.record = record
+        return super().__init__(data=[
+            DHT_STORE,
+            format(key, 'x'),
+            str(record),
+        ])
+
+
 class Node:
-    def __init__(self, directory):
+    def __init__(self, directory, dht_enabled=DHT_ENABLED):
         self.neighbors: Set[str] = set()
         self.file_system = FileSystem(directory)
         self.search_tracker = SearchTracker()
+        self.filter_tracker = FilterTracker()
+        self.rpc_tracker = RpcTracker()
+        self.dht_enabled = dht_enabled
+        self.dht = None
 
     def run(self):
         self.send_socket = socket(AF_INET, SOCK_DGRAM)
         self.send_socket.connect(("8.8.8.8", 80))
         self.ip_address = self.send_socket.getsockname()[0]
+        if self.dht_enabled:
+            self.dht = DistributedHashTable(
+                self.ip_address,
+                find_rpc=self.send_dht_find,
+                store_rpc=self.send_dht_store,
+            )
         Thread(target=self.handle_broadcast).start()
         Thread(target=self.handle_udp_message).start()
         Thread(target=self.handle_tcp_message).start()
@@ -195,12 +283,15 @@ class Node:
         self.broadcast()
         self.choose_neighbors()
         print('end', self.neighbors)
+        Thread(target=self.handle_filter_updates).start()
+        if self.dht:
+            Thread(target=self.handle_dht_records).start()
 
         self.run_user_interface()
 
     def handle_incoming_message(self, sock):
         while True:
-            msg, address = sock.recvfrom(1024)
+            msg, address = sock.recvfrom(UDP_BUFFER_SIZE)
             address = address[0]
             if address == self.ip_address:
                 continue
@@ -302,6 +393,14 @@ class Node:
             self.handle_search_file_packet(packet, from_address)
         elif isinstance(packet, SearchResultPacket):
             self.handle_search_result_packet(packet, from_address)
+        elif isinstance(packet, FilterUpdatePacket):
+            self.handle_filter_update_packet(packet, from_address)
+        elif isinstance(packet, DhtFindPacket) and self.dht:
+            self.handle_dht_find_packet(packet, from_address)
+        elif isinstance(packet, DhtResponsePacket) and self.dht:
+            self.handle_dht_response_packet(packet)
+        elif isinstance(packet, DhtStorePacket) and self.dht:
+            self.handle_dht_store_packet(packet, from_address)
 
     def handle_broadcast_packet(self, from_address):
         self.send_socket.sendto(
@@ -373,6 +472,120 @@ class Node:
         #     depth=packet.depth
         # )
 
+    def handle_filter_update_packet(self, packet: FilterUpdatePacket, from_address):
+        if from_address in self.neighbors:
+            self.filter_tracker.update_neighbor_filter(
+                from_address, packet.bloom_filter)
+
+    def handle_filter_updates(self):
+        while True:
+            self.filter_tracker.rebuild_local_filter(
+                self.file_system.list_files())
+            self.send_filter_updates()
+            sleep(BLOOM_FILTER_UPDATE_INTERVAL_IN_SECONDS)
+
+    def send_filter_updates(self):
+        filter_updates = self.filter_tracker.create_filter_updates(
+            list(self.neighbors))
+        for neighbor, bloom_filter in filter_updates.items():
+            try:
+                self.send_socket.sendto(
+                    FilterUpdatePacket(bloom_filter).encode(),
+                    (neighbor, UDP_LISTEN_PORT),
+                )
+            except OSError as e:
+                print('ERROR: could not send filter to', neighbor, e)
+                self.filter_tracker.forget_sent_filter(neighbor)
+
+    def handle_dht_find_packet(self, packet: DhtFindPacket, from_address):
+        contacts, records = self.dht.handle_find(
+            from_address, packet.key, packet.find_value)
+        self.send_socket.sendto(
+            DhtResponsePacket(
+                rpc_id=packet.rpc_id,
+                contacts=contacts,
+                records=records,
+            ).encode(),
+            (from_address, UDP_LISTEN_PORT),
+        )
+
+    def handle_dht_response_packet(self, packet: DhtResponsePacket):
+        self.rpc_tracker.resolve_rpc(
+            packet.rpc_id, (packet.contacts, packet.records))
+
+    def handle_dht_store_packet(self, packet: DhtStorePacket, from_address):
+        self.dht.handle_store(from_address, packet.key, packet.record)
+
+    def send_dht_find(self, address, key, find_value):
+        rpc_id = self.rpc_tracker.create_rpc()
+        self.send_socket.sendto(
+            DhtFindPacket(
+                rpc_id=rpc_id,
+                key=key,
+                find_value=find_value,
+            ).encode(),
+            (address, UDP_LISTEN_PORT),
+        )
+        return self.rpc_tracker.wait_for_rpc(rpc_id, DHT_RPC_TIMEOUT_IN_SECONDS)
+
+    def send_dht_store(self, address, key, record):
+        self.send_socket.sendto(
+            DhtStorePacket(
+                key=key,
+                record=record,
+            ).encode(),
+            (address, UDP_LISTEN_PORT),
+        )
+
+    def handle_dht_records(self):
+        self.dht.bootstrap(list(self.potential_neighbors))
+        while True:
+            self.dht.record_store.remove_expired_records()
+            self.publish_dht_records()
+            sleep(DHT_REPUBLISH_INTERVAL_IN_SECONDS)
+
+    def publish_dht_records(self):
+        files = self.file_system.list_files()
+        # Exact lookups download straight from the source, which must
+        # therefore know that it serves these files itself.
+        self.search_tracker.update_file_tracker(
+            self.search_tracker.create_results_from_files(
+                files,
+                self.ip_address,
+            )
+        )
+        for file in files:
+            self.dht.publish(
+                dht_key(file.name),
+                DhtRecord(
+                    file_name=file.name,
+                    file_size=file.size,
+                    source=self.ip_address,
+                    expires_at=time() + DHT_RECORD_TTL_IN_SECONDS,
+                ),
+            )
+
+    def handle_exact_search(self, file_name, search_id):
+        result = self.dht.lookup(dht_key(file_name), find_value=True)
+        print('dht lookup', result.hops, result.messages)
+        search_results = [
+            FileSearchResult(
+                file_name=record.file_name,
+                file_size=record.file_size,
+                source=record.source,
+                depth=result.hops,
+            )
+            for record in result.records
+            if record.file_name == file_name and record.source != self.ip_address
+        ]
+        self.search_tracker.update_file_tracker(search_results)
+        self.handle_file_search_result(
+            file_name=file_name,
+            reached_nodes=[],
+            search_results=search_results,
+            search_id=search_id,
+        )
+
     def broadcast(self):
         self.potential_neighbors = dict()
 
@@ -418,16 +631,33 @@ class Node:
                 self.state = STATE_WAIT
                 requested_file_name = input("Enter file name:\n")
                 search_id = str(uuid4().bytes)
-                self.handle_search(
-                    file_name=requested_file_name,
-                    search_id=search_id,
-                )
-                self.create_search_result_response_from_neighbors(
+                if requested_file_name.startswith(EXACT_SEARCH_PREFIX):
+                    requested_file_name = requested_file_name[len(EXACT_SEARCH_PREFIX):]
+                    if self.dht:
+                        self.handle_exact_search(
+                            file_name=requested_file_name,
+                            search_id=search_id,
+                        )
+                        continue
+                    print('exact lookup needs DHT_ENABLED, searching by name instead')
+                has_sent_packet = self.handle_search(
                     file_name=requested_file_name,
                     search_id=search_id,
-                    reached_nodes=[],
-                    files=[]
                 )
+                if has_sent_packet:
+                    self.create_search_result_response_from_neighbors(
+                        file_name=requested_file_name,
+                        search_id=search_id,
+                        reached_nodes=[],
+                        files=[]
+                    )
+                else:
+                    self.handle_file_search_result(
+                        file_name=requested_file_name,
+                        reached_nodes=[],
+                        search_results=[],
+                        search_id=search_id,
+                    )
             elif self.state == STATE_WAIT:
                 pass
             else:
@@ -455,6 +685,9 @@ class Node:
                             ]
                         ),
                     )
+                    self.filter_tracker.add_local_file(
+                        file_search_result.file_name,
+                    )
 
     def download_file(self, file_search_result: FileSearchResult) -> Iterable[DownloadFilePacket]:
         print(file_search_result)
@@ -482,24 +715,30 @@ class Node:
     def handle_search(self, file_name, search_id, current_reached_nodes=[]):
         print("search", current_reached_nodes)
         has_sent_packet = False
-        for neighbor in self.neighbors:
-            if neighbor not in current_reached_nodes:
-                self.send_socket.sendto(
-                    SearchFilePacket(
-                        file_name=file_name,
-                        reached_nodes=[
-                            self.ip_address,
-                            *current_reached_nodes,
-                        ],
-                        search_id=search_id
-                    ).encode(),
-                    (neighbor, UDP_LISTEN_PORT),
-                )
-                self.search_tracker.add_nieghbor_for_search(
-                    search_id,
-                    neighbor,
-                )
-                has_sent_packet = True
+        for neighbor in self.filter_tracker.choose_neighbors_for_search(
+            [
+                neighbor
+                for neighbor in list(self.neighbors)
+                if neighbor not in current_reached_nodes
+            ],
+            file_name,
+        ):
+            self.send_socket.sendto(
+                SearchFilePacket(
+                    file_name=file_name,
+                    reached_nodes=[
+                        self.ip_address,
+                        *current_reached_nodes,
+                    ],
+                    search_id=search_id
+                ).encode(),
+                (neighbor, UDP_LISTEN_PORT),
+            )
+            self.search_tracker.add_nieghbor_for_search(
+                search_id,
+                neighbor,
+            )
+            has_sent_packet = True
         return has_sent_packet
 
     def handle_file_search_result(self, file_name, reached_nodes, search_results, search_id):
@@ -0,0 +1,236 @@
+from argparse import ArgumentParser
+from random import Random
+from time import time
+from typing import Dict, List, Set, Tuple
+
+from dht import DhtRecord, DistributedHashTable, dht_key
+from enums import DHT_RECORD_TTL_IN_SECONDS, EXACT_SEARCH_PREFIX
+from file_system import FileSystemSearchResult
+from filter_tracker import FilterTracker
+
+
+class SimulatedPeer:
+    def __init__(self, address, network: Dict[str, 'SimulatedPeer']):
+        self.address = address
+        self.network = network
+        self.neighbors: Set[str] = set()
+        self.files: List[FileSystemSearchResult] = []
+        self.filter_tracker = FilterTracker()
+        self.dht = DistributedHashTable(
+            address,
+            find_rpc=self.send_dht_find,
+            store_rpc=self.send_dht_store,
+        )
+
+    def send_dht_find(self, address, key, find_value):
+        return self.network[address].dht.handle_find(self.address, key, find_value)
+
+    def send_dht_store(self, address, key, record):
+        self.network[address].dht.handle_store(self.address, key, record)
+
+
+def build_network(number_of_nodes, rng: Random, degree=None) -> Dict[str, SimulatedPeer]:
+    # Nodes join one by one and pick neighbors the way Node.choose_neighbors
+    # does, with every earlier node answering the join broadcast. With a
+    # degree, they instead link to that many random earlier nodes, which
+    # gives a sparse overlay with a larger diameter. The DHT is bootstrapped
+    # from the chosen neighbors only and learns other contacts from lookups.
+    network: Dict[str, SimulatedPeer] = dict()
+    for i in range(number_of_nodes):
+        address = f'10.0.{i // 256}.{i % 256}'
+        sorted_potential_neighbors = sorted([
+            (len(peer.neighbors), peer.address)
+            for peer in network.values()
+        ])
+        peer = network[address] = SimulatedPeer(address, network)
+        chosen_neighbors = []
+        if sorted_potential_neighbors:
+            if degree:
+                chosen_neighbors = rng.sample(
+                    sorted_potential_neighbors,
+                    min(degree, len(sorted_potential_neighbors)),
+                )
+            else:
+                number_of_neighbors = sorted_potential_neighbors[-1][0] or 1
+                chosen_neighbors = sorted_potential_neighbors[:number_of_neighbors]
+            for _, neighbor in chosen_neighbors:
+                peer.neighbors.add(neighbor)
+                network[neighbor].neighbors.add(address)
+        peer.dht.bootstrap([neighbor for _, neighbor in chosen_neighbors])
+    return network
+
+
+FILE_NAME_WORDS = [
+    'report', 'invoice', 'lecture', 'project', 'backup', 'photo', 'music',
+    'thesis', 'budget', 'notes', 'slides', 'dataset', 'resume', 'manual',
+    'contract', 'recipe', 'poster', 'draft', 'summary', 'schedule',
+]
+
+
+def place_files(network: Dict[str, SimulatedPeer], files_per_node, rng: Random):
+    # Names share words, so substring queries match files on several nodes.
+    for peer in network.values():
+        for _ in range(files_per_node):
+            file_name = f'{rng.choice(FILE_NAME_WORDS)}_{rng.randint(1000, 9999)}.txt'
+            peer.files.append(FileSystemSearchResult(name=file_name, size=1))
+
+
+def exchange_filters(network: Dict[str, SimulatedPeer]):
+    messages = 0
+    for peer in network.values():
+        peer.filter_tracker.rebuild_local_filter(peer.files)
+    # Each round carries the summaries one hop further, like one
+    # BLOOM_FILTER_UPDATE_INTERVAL_IN_SECONDS period of Node, until no
+    # filter changes anymore.
+    while True:
+        updates = [
+            (peer, neighbor, bloom_filter)
+            for peer in network.values()
+            for neighbor, bloom_filter in peer.filter_tracker.create_filter_updates(peer.neighbors).items()
+        ]
+        if not updates:
+            return messages
+        for peer, neighbor, bloom_filter in updates:
+            network[neighbor].filter_tracker.update_neighbor_filter(peer.address, bloom_filter)
+        messages += len(updates)
+
+
+def publish_records(network: Dict[str, SimulatedPeer]):
+    messages = 0
+    for peer in network.values():
+        for file in peer.files:
+            messages += peer.dht.publish(
+                dht_key(file.name),
+                DhtRecord(file.name, file.size, peer.address, time() + DHT_RECORD_TTL_IN_SECONDS),
+            ).messages
+    return messages
+
+
+def matches(file_name, searched_name):
+    return searched_name.lower() in file_name.lower()
+
+
+def find_matching_files(network: Dict[str, SimulatedPeer], origin, file_name) -> Set[Tuple[str, str]]:
+    # A node's search results never include its own files.
+    return {
+        (peer.address, file.name)
+        for peer in network.values()
+        if peer.address != origin
+        for file in peer.files
+        if matches(file.name, file_name)
+    }
+
+
+def flood_search(network: Dict[str, SimulatedPeer], origin, file_name, routed):
+    # Every node forwards a query once and answers every query it receives.
+    # Node itself forwards along every loop-free path, so real floods cost
+    # at least this much.
+    messages, hops = 0, 0
+    reached_from = {origin: None}
+    frontier = [origin]
+    while frontier:
+        next_frontier = []
+        for address in frontier:
+            peer = network[address]
+            neighbors = [
+                neighbor
+                for neighbor in peer.neighbors
+                if neighbor != reached_from[address]
+            ]
+            if routed:
+                neighbors = peer.filter_tracker.choose_neighbors_for_search(neighbors, file_name)
+            for neighbor in neighbors:
+                messages += 2
+                if neighbor not in reached_from:
+                    reached_from[neighbor] = address
+                    next_frontier.append(neighbor)
+        if next_frontier:
+            hops += 1
+        frontier = next_frontier
+    found_files = {
+        (address, file.name)
+        for address in reached_from
+        if address != origin
+        for file in network[address].files
+        if matches(file.name, file_name)
+    }
+    return messages, hops, found_files
+
+
+def dht_search(network: Dict[str, SimulatedPeer], origin, file_name):
+    # The DHT only answers exact names, so substring queries find nothing.
+    result = network[origin].dht.lookup(dht_key(file_name), find_value=True)
+    found_files = {
+        (record.source, record.file_name)
+        for record in result.records
+        if record.source != origin and matches(record.file_name, file_name)
+    }
+    return result.messages, result.hops, found_files
+
+
+def simulate(number_of_nodes, files_per_node, number_of_queries, rng: Random, degree=None):
+    network = build_network(number_of_nodes, rng, degree)
+    place_files(network, files_per_node, rng)
+    filter_messages = exchange_filters(network)
+    publish_messages = publish_records(network)
+
+    # Recall is the share of matching files, on nodes other than the
+    # origin, that a mode returns.
+    totals = {
+        (query, mode): [0, 0, 0]
+        for query in ('exact', 'substring')
+        for mode in ('flood', 'routed', 'dht')
+    }
+    addresses = list(network)
+    for _ in range(number_of_queries):
+        origin, target = rng.sample(addresses, 2)
+        file_name = rng.choice(network[target].files).name
+        stem_length = file_name.index('.')
+        substring_length = rng.randint(3, 5)
+        substring_start = rng.randrange(stem_length - substring_length + 1)
+        for query, searched_name in (
+            ('exact', file_name),
+            ('substring', file_name[substring_start:substring_start + substring_length]),
+        ):
+            matching_files = find_matching_files(network, origin, searched_name)
+            for mode, (messages, hops, found_files) in (
+                ('flood', flood_search(network, origin, searched_name, routed=False)),
+                ('routed', flood_search(network, origin, searched_name, routed=True)),
+                ('dht', dht_search(network, origin, searched_name)),
+            ):
+                totals[query, mode][0] += messages
+                totals[query, mode][1] += hops
+                totals[query, mode][2] += len(found_files & matching_files) / len(matching_files)
+
+    for (query, mode), (messages, hops, recall) in totals.items():
+        print(
+            f'{number_of_nodes:>6} {query:>9} {mode:>7}'
+            f' {messages / number_of_queries:>14.1f}'
+            f' {hops / number_of_queries:>10.2f}'
+            f' {recall / number_of_queries:>7.3f}'
+        )
+    print(
+        f'{"":>6} {"":>9} {"":>7} filter exchange: {filter_messages} messages,'
+        f' dht publish: {publish_messages / (number_of_nodes * files_per_node):.1f} messages/record'
+    )
+
+
+def main():
+    parser = ArgumentParser(
+        description=f'Compare flood and filter-routed search with exact ({EXACT_SEARCH_PREFIX}name) DHT lookups.',
+    )
+    parser.add_argument('--nodes', type=int, nargs='+', default=[8, 16, 32, 64, 128])
+    parser.add_argument('--files-per-node', type=int, default=5)
+    parser.add_argument('--queries', type=int, default=100)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--degree', type=int, help='build a sparse random overlay instead of the choose_neighbors one')
+    args = parser.parse_args()
+
+    rng = Random(args.seed)
+    print(f'{"nodes":>6} {"query":>9} {"mode":>7} {"messages/query":>14} {"hops/query":>10} {"recall":>7}')
+    for number_of_nodes in args.nodes:
+        simulate(number_of_nodes, args.files_per_node, args.queries, rng, args.degree)
+
+
+if __name__ == '__main__':
+    main()